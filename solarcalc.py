@@ -33,7 +33,7 @@ import pandas as pd
 __version__ = "1.1"
 __project_url__ = "https://github.com/cgq-qgc/solarcalc"
 
-# To avoid "RuntimeWarning: overflow encountered in power" warnings when
+# To avoid "RuntimeWarning: overflow encountered in exp" warnings when
 # calculating tau**m, which become very large just outside of the
 # sunrise and sunset times. This is not relevant here since Sd values
 # before sunrise and after sunset are forced to 0 anyway.
@@ -78,17 +78,33 @@ def calc_eqn_of_time(dayofyear: int) -> float:
     """
     f = (279.575 + 0.98565 * dayofyear) * np.pi / 180
 
+    # The multiple-angle terms are derived from sin(f) and cos(f) with
+    # trigonometric identities, so that only two trigonometric functions
+    # need to be evaluated.
+    sin_f = np.sin(f)
+    cos_f = np.cos(f)
+    sin_2f = 2 * sin_f * cos_f
+    cos_2f = cos_f**2 - sin_f**2
+    sin_3f = sin_f * (3 - 4 * sin_f**2)
+    cos_3f = cos_f * (4 * cos_f**2 - 3)
+    sin_4f = 2 * sin_2f * cos_2f
+
     return (
-        -104.7 * np.sin(f) +
-        596.2 * np.sin(2 * f) +
-        4.3 * np.sin(3 * f) +
-        -12.7 * np.sin(4 * f) +
-        -429.3 * np.cos(f) +
-        -2.0 * np.cos(2 * f) +
-        19.3 * np.cos(3 * f)
+        -104.7 * sin_f +
+        596.2 * sin_2f +
+        4.3 * sin_3f +
+        -12.7 * sin_4f +
+        -429.3 * cos_f +
+        -2.0 * cos_2f +
+        19.3 * cos_3f
         ) / 3600
 
 
+# The Equation of Time depends only on the day of year. It is thus tabulated
+# once for days of year 1 to 366 and looked up in calc_solar_rad.
+_ET_TABLE = calc_eqn_of_time(np.arange(1, 367))
+
+
 def calc_long_corr(lon_dd: float) -> float:
     """
     Calculate the longitudinal correction.
@@ -104,8 +120,10 @@ def calc_long_corr(lon_dd: float) -> float:
     float
         Longitudinal correction in hours.
     """
-    # Calculate the local standard time meridian.
-    lstm = lon_dd - lon_dd % (np.sign(lon_dd) * 15)
+    # Calculate the local standard time meridian, which is the first
+    # multiple of 15 degrees found when going from the site longitude
+    # toward the prime meridian.
+    lstm = np.trunc(lon_dd / 15) * 15
 
     # Calculate the longitudinal correction in hours.
     long_corr = (lon_dd - lstm) * (24 / 360)
@@ -113,6 +131,36 @@ def calc_long_corr(lon_dd: float) -> float:
     return long_corr
 
 
+def calc_solar_noon(dayofyear: int, lon_dd: float) -> float:
+    """
+    Calculate the solar noon time.
+
+    The day of year and longitude inputs can be numpy arrays, in which
+    case they are broadcasted against each other. For example,
+    calc_solar_noon(dayofyear[:, None], lon_dd[None, :]) returns the
+    solar noon for each day of year (rows) and longitude (columns).
+
+    Source
+    ------
+    Equation 11.3 in Campbell, G.S. and J.M. Norman (1998). An Introduction to
+    Environmental Biophysics.
+
+    Parameters
+    ----------
+    dayofyear : int
+        Day of year.
+    lon_dd : float
+        Longitude of fieldsite in decimal degrees. Negative value if West
+        of meridian and positive value if East of meridian.
+
+    Returns
+    -------
+    float
+        Solar noon time in hours.
+    """
+    return 12 - calc_long_corr(lon_dd) - calc_eqn_of_time(dayofyear)
+
+
 def calc_solar_declination(dayofyear: int) -> float:
     """
     Calculate the solar declination angle.
@@ -142,6 +190,46 @@ def calc_solar_declination(dayofyear: int) -> float:
     return temp2
 
 
+# The solar declination depends only on the day of year. It is thus
+# tabulated once for days of year 1 to 366 and looked up in calc_solar_rad.
+_SOLAR_DEC_TABLE = calc_solar_declination(np.arange(1, 367))
+
+
+def calc_cos_zenith_angle(lat_rad: float, solar_dec: float, time: float,
+                          solar_noon: float) -> float:
+    """
+    Cosine of the zenith angle approximation.
+
+    Source
+    ------
+    Equation 11.1 in Campbell, G.S. and J.M. Norman (1998). An Introduction to
+    Environmental Biophysics.
+
+    Parameters
+    ----------
+    lat_rad : float
+        Latitude in radians.
+    solar_dec : float
+        Solar declination angle in radians.
+    time : float
+        Time of the day in hours.
+    solar_noon : float
+        Solar noon value in hours.
+
+    Returns
+    -------
+    cos_zenith_angle : float
+        Cosine of the zenith angle approximation.
+    """
+    # The sun moves 15 degrees per hour across the sky.
+    hour_angle = (15 * np.pi / 180) * (solar_noon - time)
+    cos_zenith_angle = (
+        np.sin(lat_rad) * np.sin(solar_dec) +
+        np.cos(lat_rad) * np.cos(solar_dec) * np.cos(hour_angle)
+        )
+    return cos_zenith_angle
+
+
 def calc_zenith_angle(lat_rad: float, solar_dec: float, time: float,
                       solar_noon: float) -> float:
     """
@@ -168,12 +256,8 @@ def calc_zenith_angle(lat_rad: float, solar_dec: float, time: float,
     zenith_angle : float
         Zenith angle approximation in radians.
     """
-    hour_angle = 15 * (solar_noon - time) * np.pi / 180
-    zenith_angle = np.arccos(
-        np.sin(lat_rad) * np.sin(solar_dec) +
-        np.cos(lat_rad) * np.cos(solar_dec) * np.cos(hour_angle)
-        )
-    return zenith_angle
+    return np.arccos(
+        calc_cos_zenith_angle(lat_rad, solar_dec, time, solar_noon))
 
 
 def calc_halfdaylength(solar_dec: float, lat_rad: float,
@@ -240,112 +324,138 @@ def calc_solar_rad(lon_dd: float, lat_dd: float, alt: float,
     The index of the dataframe contains the date and time for each hourly
     reading in a pandas DatetimeIndex.
     """
+    # Extract the input data from the dataframe as numpy arrays once, so
+    # that all subsequent calculations operate on plain numpy arrays.
+    ptot = climate_data['ptot_mm'].to_numpy()
+    tamax = climate_data['tamax_degC'].to_numpy()
+    tamin = climate_data['tamin_degC'].to_numpy()
+    dayofyear = climate_data.index.dayofyear.to_numpy()
+
     # Convert rain[day of year] = 1 if rain and rain = 0 if no rain.
-    rain = (climate_data['ptot_mm'] > 1).values.astype(int)
-    deltaT = (climate_data['tamax_degC'] -
-              climate_data['tamin_degC']).abs().round(5).values
+    rain = (ptot > 1).astype(int)
+    deltaT = np.round(np.abs(tamax - tamin), 5)
 
     # Estimate the atmospheric transmittance (tau) based on the
-    # input climate data.
-    n = len(climate_data)
-    tau = np.zeros(n)
-    for i in range(n):
-        tau[i] = 0.70  # Clear sky value as  given in Gates (1980)
-
-        # If it is raining then assume it is overcast (cloud cover).
-        if rain[i] == 1:
-            tau[i] = 0.40  # from Liu and Jordan (1960)
-
-        # If it has been raining for two days then even
-        # darker (denser cloud cover).
-        if i > 0 and rain[i] == 1 and rain[i - 1] == 1:
-            tau[i] = 0.30
-
-        # Assign pre-rain days to 80% of tau value ?
-        if i < (n - 1) and rain[i] == 0 and rain[i + 1] == 1:
-            tau[i] = 0.60
-
-        # If airtemperature rise is less than 10 --> lower tau value
-        # unless by poles
-        if np.abs(lat_dd) < 60:
-            if deltaT[i] <= 10 and deltaT[i] != 0:
-                tau[i] = tau[i] / (11 - deltaT[i])
-
-    # Expand rain, deltaT and tau from daily to hourly time frame.
-    rain = np.repeat(rain, 24)
-    deltaT = np.repeat(deltaT, 24)
-    tau = np.repeat(tau, 24)
-
-    # Prepare the dataframe that will be used to store the results and that
-    # will be returned as the output of this function.
-    dataframe = pd.DataFrame(
-        [],
-        index=pd.date_range(
-            start=climate_data.index[0],
-            end=climate_data.index[-1] + pd.Timedelta('23H'),
-            freq='H'))
-    dataframe.index.name = 'datetime'
+    # input climate data. No rain is assumed before the first day and
+    # after the last day of the series.
+    rain_prev = np.concatenate(([0], rain[:-1]))
+    rain_next = np.concatenate((rain[1:], [0]))
+    tau = np.select(
+        [
+            # If it has been raining for two days then even
+            # darker (denser cloud cover).
+            (rain == 1) & (rain_prev == 1),
+            # If it is raining then assume it is overcast (cloud cover).
+            rain == 1,
+            # Assign pre-rain days to 80% of tau value ?
+            rain_next == 1
+        ],
+        [0.30, 0.40, 0.60],
+        # Clear sky value as given in Gates (1980).
+        default=0.70)
+
+    # If airtemperature rise is less than 10 --> lower tau value
+    # unless by poles
+    if np.abs(lat_dd) < 60:
+        mask = (deltaT <= 10) & (deltaT != 0)
+        np.divide(tau, 11 - deltaT, out=tau, where=mask)
+
+    # The calculations below are done on 2D arrays of shape (n, 24), where
+    # each row corresponds to a day and each column to an hour of that day.
+    # Values that vary only from one day to another are thus calculated once
+    # per day and broadcasted against the hours of the day.
+    time = np.arange(24)[np.newaxis, :]
+
+    # Calculate the values that depend only on the site location.
+    lat_rad = np.radians(lat_dd)
 
-    dayofyear = dataframe.index.dayofyear.values
-    time = dataframe.index.hour.values
+    # Calculate the atmospheric pressure at the observation site using
+    # Equation 3.7 in Campbell and Norman (1998).
+    Pa = 101.3 * np.exp(-1 * alt / 8200)
 
     # Calculate the longitudinal correction to solar noon.
     LC = calc_long_corr(lon_dd)
 
-    # Calculate the correction for Equation of Time.
-    ET = calc_eqn_of_time(dayofyear)
+    Spo = 1360  # Solar constant in W/m2
+
+    # The Equation of Time, the solar declination and the half day length
+    # depend only on the day of year, which takes at most 366 distinct
+    # values. They are thus looked up in tables calculated for each day of
+    # the year rather than calculated for each day of the series.
+    doy_idx = dayofyear - 1
 
     # Calculate solar noon value.
-    solarnoon = 12 - LC - ET
+    solarnoon = (12 - LC - _ET_TABLE[doy_idx])[:, np.newaxis]
 
-    # Calculate the solar declination angle
-    solarD = calc_solar_declination(dayofyear)
+    # Get the solar declination angle
+    solarD = _SOLAR_DEC_TABLE[doy_idx]
 
     # Calculate the length of solar day (excluding twilight time).
-    halfdaylength = calc_halfdaylength(solarD, np.radians(lat_dd))
+    halfdaylength = calc_halfdaylength(
+        _SOLAR_DEC_TABLE, lat_rad)[doy_idx][:, np.newaxis]
 
-    # Calculate the sunrise and sunset time.
+    # Calculate the sunrise and sunset time and the corresponding mask
+    # of the hours of the day that are outside of daylight hours.
     sunrise = solarnoon - halfdaylength
     sunset = solarnoon + halfdaylength
+    night = (time < sunrise) | (time > sunset)
 
-    # Calculate the Zenith Angle.
-    zenith_angle = calc_zenith_angle(
-        np.radians(lat_dd), solarD, time, solarnoon)
-
-    # Calculate the atmospheric pressure at the observation site using
-    # Equation 3.7 in Campbell and Norman (1998).
-    Pa = 101.3 * np.exp(-1 * alt / 8200)
+    # Calculate the cosine of the Zenith Angle. Only the cosine is required
+    # in the calculations below, so the angle itself is never calculated.
+    cos_zenith = calc_cos_zenith_angle(
+        lat_rad, solarD[:, np.newaxis], time, solarnoon)
 
     # Calculate the optical air mass number using Equation 11.12 in
     # Campbell and Norman (1998).
-    m = Pa / 101.3 / np.cos(zenith_angle)
-
-    Spo = 1360  # Solar constant in W/m2
-
-    # Calculate the hourly beam irradiance on a horizontal surface (Sb)
-    # using Equations 11.8 and 11.11 in Campbell and Norman (1998).
-    Sb = Spo * np.power(tau, m) * np.cos(zenith_angle)
-    Sb[(time < sunrise) | (time > sunset)] = 0
+    m = (Pa / 101.3) / cos_zenith
 
-    # Calculate the diffuse sky irradiance on horizontal plane (Sd)
-    # using Equation 11.13 in Campbell and Norman (1998).
-    Sd = 0.3 * (1 - np.power(tau, m)) * Spo * np.cos(zenith_angle)
-    Sd[(time < sunrise) | (time > sunset)] = 0
+    # Calculate the atmospheric transmittance raised to the power of the
+    # optical air mass number, which is common to Sb and Sd. This is
+    # calculated as exp(m * log(tau)), so that the logarithm of tau is
+    # evaluated only once per day.
+    tau_m = np.exp(m * np.log(tau)[:, np.newaxis])
 
     # The global solar radiation on a horizontal surface is the sum of the
-    # horizontal direct beam (Sb) and diffuse radiation (Sd).
-    St = Sb + Sd
+    # horizontal direct beam (Sb) and diffuse radiation (Sd), which are
+    # given by Equations 11.8 and 11.11 and by Equation 11.13 in
+    # Campbell and Norman (1998), respectively:
+    #     Sb = Spo * tau**m * cos(zenith)
+    #     Sd = 0.3 * (1 - tau**m) * Spo * cos(zenith)
+    # Both terms are evaluated together as a single expression, so that
+    # no intermediate array is required for Sb and Sd.
+    St = Spo * cos_zenith * (0.3 + 0.7 * tau_m)
+    St[night] = 0
+
+    # Fill NaN and infinite values with zeros. These can occur at high
+    # latitudes, where the sunrise and sunset times are undefined.
+    np.nan_to_num(St, copy=False, nan=0, posinf=0, neginf=0)
 
     # Check for never daylight northern latitudes.
-    St[St < 0] = 0
+    np.clip(St, 0, None, out=St)
 
-    # Fill NaN values with zeros.
-    St[pd.isnull(St)] = 0
+    # Round the results to 2 decimals, in place and over the whole grid.
+    np.round(St, 2, out=St)
 
-    # Fill the output dataframe with the results.
-    dataframe['solar_rad_W/m2'] = np.round(St, 2)
-    dataframe['deltat_degC'] = deltaT
-    dataframe['tau'] = tau
+    # Build the hourly index of the output dataframe directly from the
+    # daily index of the input climate data.
+    index = (
+        climate_data.index.repeat(24) +
+        pd.to_timedelta(np.tile(np.arange(24), len(dayofyear)), unit='h')
+        )
+    index.name = 'datetime'
+
+    # Set the frequency of the hourly index when the input data are daily
+    # and contiguous, as the hourly readings are then evenly spaced.
+    if np.all(np.diff(climate_data.index.values) == np.timedelta64(1, 'D')):
+        index.freq = pd.offsets.Hour()
+
+    # Build the output dataframe from the results in a single step,
+    # expanding the daily values to the hourly time frame.
+    dataframe = pd.DataFrame(
+        {'solar_rad_W/m2': St.ravel(),
+         'deltat_degC': np.repeat(deltaT, 24),
+         'tau': np.repeat(tau, 24)},
+        index=index)
 
     return dataframe
 
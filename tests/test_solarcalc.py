@@ -7,7 +7,6 @@
 
 # ---- Standard imports
 import os.path as osp
-from datetime import datetime
 
 # ---- Third party imports
 import pytest
@@ -15,18 +14,16 @@ import pandas as pd
 import numpy as np
 
 # ---- Local imports
-from solarcalc import (calc_long_corr, calc_eqn_of_time, calc_solar_rad)
+from solarcalc import (calc_long_corr, calc_eqn_of_time, calc_solar_noon,
+                       calc_solar_rad)
 
 
-@pytest.fixture
-def datetimes():
-    return pd.to_datetime([
-        datetime(2000, 1, 1),
-        datetime(2000, 3, 31),
-        datetime(2000, 6, 19),
-        datetime(2000, 8, 18),
-        datetime(2000, 11, 26)
-        ])
+@pytest.fixture(scope='module')
+def dayofyear():
+    dates = np.array([
+        '2000-01-01', '2000-03-31', '2000-06-19', '2000-08-18', '2000-11-26'
+        ], dtype='datetime64[D]')
+    return (dates - dates.astype('datetime64[Y]')).astype(np.int64) + 1
 
 
 @pytest.fixture
@@ -59,31 +56,51 @@ def climate_data():
 # =============================================================================
 # ---- Tests
 # =============================================================================
-def test_calc_eqn_of_time(datetimes):
+def test_calc_eqn_of_time(dayofyear):
     """
     Test that the Equation of Time is calculated as expected.
     """
-    results = calc_eqn_of_time(datetimes.dayofyear.values) * 60
+    results = calc_eqn_of_time(dayofyear) * 60
 
     # Table 11.1 in Campbell, G.S. and J.M. Norman (1998).
     expected_results = np.array([-0.057, -0.072, -0.019, -0.065, 0.213]) * 60
-    err = np.abs(results - expected_results)
-    assert np.all(err < 0.3)
+    np.testing.assert_allclose(results, expected_results, rtol=0, atol=0.3)
 
     # https://gml.noaa.gov/grad/solcalc/
     expected_results = np.array([-3.19, -4.1, -1.4, -3.83, 12.65])
-    err = np.abs(results - expected_results)
-    assert np.all(err < 0.3)
+    np.testing.assert_allclose(results, expected_results, rtol=0, atol=0.3)
+
+
+@pytest.mark.parametrize('doy, expected', [
+    (1, -0.057), (91, -0.072), (171, -0.019), (231, -0.065), (331, 0.213)
+    ])
+def test_calc_eqn_of_time_scalar(doy, expected):
+    """
+    Test that the Equation of Time is calculated as expected when a single
+    day of year is passed to the function.
+    """
+    # Table 11.1 in Campbell, G.S. and J.M. Norman (1998).
+    assert np.ndim(calc_eqn_of_time(doy)) == 0
+    assert abs(calc_eqn_of_time(doy) - expected) * 60 < 0.3
 
 
-def test_calc_solar_noon(datetimes):
+def test_calc_long_corr():
+    """
+    Test that the longitudinal correction is calculated as expected,
+    including on the prime meridian and on multiples of 15 degrees.
+    """
+    assert calc_long_corr(0) == 0
+    assert calc_long_corr(-75) == 0
+    assert calc_long_corr(30) == 0
+    assert abs(calc_long_corr(-74.351267) - (-14.351267 / 15)) < 1e-12
+    assert abs(calc_long_corr(10.3) - (10.3 / 15)) < 1e-12
+
+
+def test_calc_solar_noon(dayofyear):
     """
     Test that solar noon is calculated as expected.
     """
-    lon_dd = -74.351267
-    LC = calc_long_corr(lon_dd)
-    ET = calc_eqn_of_time(datetimes.dayofyear.values)
-    solarnoon = 12 - LC - ET
+    solarnoon = calc_solar_noon(dayofyear, -74.351267)
 
     # https://gml.noaa.gov/grad/solcalc/
     # Values corrected for daylight saving time change.
@@ -95,8 +112,21 @@ def test_calc_solar_noon(datetimes):
         11 + 44/60 + 55/3600 + 1
         ])
 
-    err = np.abs(solarnoon - expected_results)
-    assert np.all(err < 0.0035)
+    np.testing.assert_allclose(
+        solarnoon, expected_results, rtol=0, atol=0.0035)
+
+
+def test_calc_solar_noon_broadcast(dayofyear):
+    """
+    Test that solar noon can be calculated for several days of year and
+    several longitudes at once by broadcasting the inputs.
+    """
+    lon_dd = np.array([-74.351267, -10.5, 0, 33.2])
+    solarnoon = calc_solar_noon(dayofyear[:, None], lon_dd[None, :])
+
+    assert solarnoon.shape == (len(dayofyear), len(lon_dd))
+    for j, lon in enumerate(lon_dd):
+        assert np.all(solarnoon[:, j] == calc_solar_noon(dayofyear, lon))
 
 
 def test_solar_calc(climate_data):
@@ -111,6 +141,7 @@ def test_solar_calc(climate_data):
         climate_data=climate_data
         )
 
+    assert solar_rad.index.freq == pd.offsets.Hour()
     assert np.all(
         solar_rad['deltat_degC'].round(12).values ==
         np.repeat([6, 10.4, 0, 0, 0, 0], 24)
@@ -144,5 +175,27 @@ def test_solar_calc(climate_data):
         )
 
 
+def test_solar_calc_rain_at_series_edges(climate_data):
+    """
+    Test that the atmospheric transmittance of the first and last days of
+    the series does not depend on the rain condition at the other end of
+    the series.
+    """
+    climate_data['tamin_degC'] = -20
+    climate_data['tamax_degC'] = 0
+    climate_data['ptot_mm'] = [1.54, 0.41, 0.00, 0.00, 0.21, 1.92]
+    solar_rad = calc_solar_rad(
+        lon_dd=-76.4687209,
+        lat_dd=56.5213541,
+        alt=100,
+        climate_data=climate_data
+        )
+
+    assert np.all(
+        solar_rad['tau'].round(12).values ==
+        np.repeat([0.4, 0.7, 0.7, 0.7, 0.6, 0.4], 24)
+        )
+
+
 if __name__ == "__main__":
     pytest.main(['-x', osp.basename(__file__), '-vv', '-rw', '-s'])